@@ -1,24 +1,71 @@
 import argparse
 import io
 import math
+import os
 import re
+import shutil
+import subprocess
 import sys
-import xml.etree.ElementTree as ET
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
-from typing import Dict, Iterable, List, Optional, Tuple
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
 import cairosvg
+from lxml import etree as ET
 from PIL import Image
 
 SVG_NS = "http://www.w3.org/2000/svg"
 NS = {"svg": SVG_NS}
-ET.register_namespace("", SVG_NS)
+SVG_G_TAG = f"{{{SVG_NS}}}g"
+SVG_PATH_TAG = f"{{{SVG_NS}}}path"
+MASKS_XPATH = ET.XPath(".//svg:mask", namespaces=NS)
 
-TOKEN_RE = re.compile(r"[A-Za-z]|-?\d*\.?\d+(?:[eE][-+]?\d+)?")
+TOKEN_RE = re.compile(r"([A-Za-z])|(-?\d*\.?\d+(?:[eE][-+]?\d+)?)")
 NUMBER_RE = re.compile(r"-?\d*\.?\d+(?:[eE][-+]?\d+)?")
-
-
-@dataclass
+UPPERCASE_MASK = 0x5F
+LOWERCASE_BIT = 0x20
+MOVE_CODE = ord("M")
+COMMAND_LAYOUTS: Tuple[Optional[Tuple[int, int, int]], ...] = tuple(
+    {
+        "M": (2, 0, 1),
+        "L": (2, 0, 1),
+        "H": (1, 0, -1),
+        "V": (1, -1, 0),
+        "C": (6, 4, 5),
+        "S": (4, 2, 3),
+        "Q": (4, 2, 3),
+        "T": (2, 0, 1),
+        "A": (7, 5, 6),
+    }.get(chr(code))
+    for code in range(128)
+)
+OFFSET_PLACEHOLDER = "__OFFSET_{:06d}__"
+OFFSET_PLACEHOLDER_RE = re.compile(rb"__OFFSET_(\d{6})__")
+OFFSET_WIDTH = len(OFFSET_PLACEHOLDER.format(0))
+ARROW_INDEX_ATTR = "data-arrow"
+DASH_PROPERTIES = ("stroke-dasharray", "stroke-dashoffset")
+TRANSPARENT_INDEX = 255
+MAX_WINDOWS_WORKERS = 61
+
+COLLECT_ARROWS_JS = """() => {
+  window.__arrows = [];
+  document.querySelectorAll("[data-arrow]").forEach((arrow) => {
+    window.__arrows[Number(arrow.dataset.arrow)] = arrow;
+  });
+}"""
+SET_OFFSETS_JS = """(offsets) => {
+  window.__arrows.forEach((arrow, index) => {
+    arrow.setAttribute("stroke-dashoffset", offsets[index]);
+  });
+}"""
+
+
+PathToken = Union[str, float]
+FrameTemplate = Tuple[bytearray, List[Tuple[int, int]]]
+
+
+@dataclass(frozen=True)
 class PathInfo:
     start: Tuple[float, float]
     end: Tuple[float, float]
@@ -27,103 +74,71 @@ class PathInfo:
 
 @dataclass
 class ArrowLine:
-    element: ET.Element
+    element: ET._Element
     direction_sign: int
 
 
-def tokenize_path(path_data: str) -> List[str]:
-    return TOKEN_RE.findall(path_data)
+def tokenize_path(path_data: str) -> List[PathToken]:
+    return [
+        command or float(number) for command, number in TOKEN_RE.findall(path_data)
+    ]
 
 
-def split_subpaths(path_data: str) -> List[str]:
-    tokens = tokenize_path(path_data)
+def _format_token(token: PathToken) -> str:
+    if isinstance(token, str):
+        return token
+    text = repr(token)
+    return text[:-2] if text.endswith(".0") else text
+
+
+def split_subpaths(tokens: List[PathToken]) -> List[Tuple[int, int]]:
     if not tokens:
         return []
 
-    subpaths: List[str] = []
-    current: List[str] = []
-    for token in tokens:
-        if token in {"M", "m"} and current:
-            subpaths.append(" ".join(current))
-            current = []
-        current.append(token)
-    if current:
-        subpaths.append(" ".join(current))
-    return subpaths
+    bounds = [0]
+    bounds.extend(
+        index for index, token in enumerate(tokens) if index and token in {"M", "m"}
+    )
+    bounds.append(len(tokens))
+    return list(zip(bounds, bounds[1:]))
 
 
 def _distance(a: Tuple[float, float], b: Tuple[float, float]) -> float:
-    return math.hypot(b[0] - a[0], b[1] - a[1])
-
-
-def _apply_command(
-    command: str, params: List[float], current: Tuple[float, float]
-) -> Tuple[float, float]:
-    x, y = current
-    is_relative = command.islower()
-    cmd = command.upper()
-    if cmd in {"M", "L", "T"}:
-        nx, ny = params[0], params[1]
-        if is_relative:
-            return x + nx, y + ny
-        return nx, ny
-    if cmd == "H":
-        nx = params[0]
-        return (x + nx, y) if is_relative else (nx, y)
-    if cmd == "V":
-        ny = params[0]
-        return (x, y + ny) if is_relative else (x, ny)
-    if cmd == "C":
-        nx, ny = params[4], params[5]
-        if is_relative:
-            return x + nx, y + ny
-        return nx, ny
-    if cmd in {"S", "Q"}:
-        nx, ny = params[2], params[3]
-        if is_relative:
-            return x + nx, y + ny
-        return nx, ny
-    if cmd == "A":
-        nx, ny = params[5], params[6]
-        if is_relative:
-            return x + nx, y + ny
-        return nx, ny
-    return current
-
-
-def parse_path(path_data: str) -> Optional[PathInfo]:
-    tokens = tokenize_path(path_data)
-    if not tokens:
+    return math.dist(a, b)
+
+
+def _polyline_length(points: List[Tuple[float, float]]) -> float:
+    return sum(map(math.dist, points, points[1:]))
+
+
+def parse_path(
+    tokens: List[PathToken], start_index: int = 0, end_index: Optional[int] = None
+) -> Optional[PathInfo]:
+    token_count = len(tokens) if end_index is None else end_index
+    if start_index >= token_count:
         return None
 
-    param_counts = {
-        "M": 2,
-        "L": 2,
-        "H": 1,
-        "V": 1,
-        "C": 6,
-        "S": 4,
-        "Q": 4,
-        "T": 2,
-        "A": 7,
-    }
-
-    current = (0.0, 0.0)
+    x = y = 0.0
     start: Optional[Tuple[float, float]] = None
     length = 0.0
+    points: List[Tuple[float, float]] = [(x, y)]
     cmd: Optional[str] = None
     pending_move = False
-    i = 0
+    run_end = token_count
+    i = start_index
 
-    while i < len(tokens):
+    while i < token_count:
         token = tokens[i]
-        if token.isalpha():
+        if isinstance(token, str):
             cmd = token
             i += 1
+            run_end = i
+            while run_end < token_count and not isinstance(tokens[run_end], str):
+                run_end += 1
             if cmd in {"Z", "z"}:
                 if start is not None:
-                    length += _distance(current, start)
-                    current = start
+                    points.append(start)
+                    x, y = start
                 continue
             if cmd in {"M", "m"}:
                 pending_move = True
@@ -138,25 +153,34 @@ def parse_path(path_data: str) -> Optional[PathInfo]:
         if cmd in {"M", "m"} and pending_move:
             pending_move = False
 
-        param_count = param_counts.get(effective_cmd.upper())
-        if param_count is None or i + param_count > len(tokens):
+        code = ord(effective_cmd)
+        layout = COMMAND_LAYOUTS[code & UPPERCASE_MASK]
+        if layout is None or i + layout[0] > run_end:
             break
-        params = [float(value) for value in tokens[i : i + param_count]]
+        param_count, x_index, y_index = layout
+        is_relative = code & LOWERCASE_BIT
+        if x_index >= 0:
+            nx = tokens[i + x_index]
+            x = x + nx if is_relative else nx
+        if y_index >= 0:
+            ny = tokens[i + y_index]
+            y = y + ny if is_relative else ny
         i += param_count
 
-        next_point = _apply_command(effective_cmd, params, current)
-        if effective_cmd.upper() == "M":
+        if code & UPPERCASE_MASK == MOVE_CODE:
             if start is None:
-                start = next_point
-            current = next_point
+                start = (x, y)
+            length += _polyline_length(points)
+            points = [(x, y)]
             continue
 
-        length += _distance(current, next_point)
-        current = next_point
+        points.append((x, y))
+
+    length += _polyline_length(points)
 
     if start is None:
         return None
-    return PathInfo(start=start, end=current, length=length)
+    return PathInfo(start=start, end=(x, y), length=length)
 
 
 def parse_style(style: str) -> Dict[str, str]:
@@ -174,51 +198,90 @@ def serialize_style(styles: Dict[str, str]) -> str:
     return "; ".join(f"{key}: {value}" for key, value in sorted(styles.items()))
 
 
-def find_arrow_lines(root: ET.Element) -> List[ArrowLine]:
-    arrow_lines: List[ArrowLine] = []
-    for group in root.findall(".//svg:g[@mask]", NS):
-        path_elements = [
-            path
-            for path in group.findall(".//svg:path", NS)
-            if path.get("d")
-        ]
-        if len(path_elements) < 2:
+@lru_cache(maxsize=4096)
+def _longest_subpath(path_data: str) -> Optional[Tuple[PathInfo, str]]:
+    tokens = tokenize_path(path_data)
+    best: Optional[Tuple[PathInfo, int, int]] = None
+    for start_index, end_index in split_subpaths(tokens):
+        info = parse_path(tokens, start_index, end_index)
+        if info and (best is None or info.length > best[0].length):
+            best = (info, start_index, end_index)
+    if best is None:
+        return None
+
+    info, start_index, end_index = best
+    return info, " ".join(map(_format_token, tokens[start_index:end_index]))
+
+
+@lru_cache(maxsize=1024)
+def _classify_arrow_group(path_data: Tuple[str, ...]) -> Optional[Tuple[int, str, int]]:
+    line: Optional[Tuple[int, PathInfo, str]] = None
+    sum_x = sum_y = 0.0
+    count = 0
+    for index, data in enumerate(path_data):
+        best = _longest_subpath(data)
+        if best is None:
             continue
+        info, subpath = best
+        sum_x += info.end[0]
+        sum_y += info.end[1]
+        count += 1
+        if line is None or info.length > line[1].length:
+            line = (index, info, subpath)
+
+    if line is None or count < 2:
+        return None
+
+    line_index, line_info, line_subpath = line
+    arrowhead_count = count - 1
+    tip = (
+        (sum_x - line_info.end[0]) / arrowhead_count,
+        (sum_y - line_info.end[1]) / arrowhead_count,
+    )
 
-        path_infos: List[Tuple[ET.Element, PathInfo, str]] = []
-        for path in path_elements:
-            path_data = path.get("d", "")
-            subpaths = split_subpaths(path_data)
-            best_info: Optional[PathInfo] = None
-            best_subpath = ""
-            for subpath in subpaths:
-                info = parse_path(subpath)
-                if info and (best_info is None or info.length > best_info.length):
-                    best_info = info
-                    best_subpath = subpath
-            if best_info:
-                path_infos.append((path, best_info, best_subpath))
-
-        if len(path_infos) < 2:
+    dist_start = _distance(line_info.start, tip)
+    dist_end = _distance(line_info.end, tip)
+    head_is_end = dist_end <= dist_start
+    direction_sign = -1 if head_is_end else 1
+    return line_index, line_subpath, direction_sign
+
+
+def _masked_group_paths(root: ET._Element) -> List[List[ET._Element]]:
+    groups: List[List[ET._Element]] = []
+    open_groups: List[List[ET._Element]] = []
+    for event, element in ET.iterwalk(root, events=("start", "end")):
+        if element.tag == SVG_G_TAG and element.get("mask") is not None:
+            if event == "start":
+                paths: List[ET._Element] = []
+                groups.append(paths)
+                open_groups.append(paths)
+            else:
+                open_groups.pop()
+        elif (
+            event == "start"
+            and open_groups
+            and element.tag == SVG_PATH_TAG
+            and element.get("d")
+        ):
+            for paths in open_groups:
+                paths.append(element)
+    return groups
+
+
+def find_arrow_lines(root: ET._Element) -> List[ArrowLine]:
+    arrow_lines: List[ArrowLine] = []
+    for path_elements in _masked_group_paths(root):
+        if len(path_elements) < 2:
             continue
 
-        line_path, line_info, line_subpath = max(
-            path_infos, key=lambda item: item[1].length
+        classified = _classify_arrow_group(
+            tuple(path.get("d", "") for path in path_elements)
         )
-        arrowhead_infos = [
-            info for element, info, _ in path_infos if element is not line_path
-        ]
-        if not arrowhead_infos:
+        if classified is None:
             continue
 
-        tip_x = sum(info.end[0] for info in arrowhead_infos) / len(arrowhead_infos)
-        tip_y = sum(info.end[1] for info in arrowhead_infos) / len(arrowhead_infos)
-        tip = (tip_x, tip_y)
-
-        dist_start = _distance(line_info.start, tip)
-        dist_end = _distance(line_info.end, tip)
-        head_is_end = dist_end <= dist_start
-        direction_sign = -1 if head_is_end else 1
+        line_index, line_subpath, direction_sign = classified
+        line_path = path_elements[line_index]
         if line_subpath:
             line_path.set("d", line_subpath)
         arrow_lines.append(ArrowLine(element=line_path, direction_sign=direction_sign))
@@ -226,25 +289,31 @@ def find_arrow_lines(root: ET.Element) -> List[ArrowLine]:
     return arrow_lines
 
 
-def relocate_masks_to_defs(root: ET.Element) -> None:
+def relocate_masks_to_defs(root: ET._Element) -> None:
     defs = root.find("svg:defs", NS)
     if defs is None:
         defs = ET.Element(f"{{{SVG_NS}}}defs")
         root.insert(0, defs)
 
-    parent_map = {child: parent for parent in root.iter() for child in parent}
-    for mask in list(root.findall(".//svg:mask", NS)):
-        parent = parent_map.get(mask)
+    for mask in MASKS_XPATH(root):
+        parent = mask.getparent()
         if parent is None or parent is defs:
             continue
         parent.remove(mask)
         defs.append(mask)
 
 
-def parse_svg_dimensions(root: ET.Element) -> Tuple[int, int]:
+def parse_svg_dimensions(root: ET._Element) -> Tuple[int, int]:
     def parse_number(value: Optional[str]) -> Optional[float]:
         if not value:
             return None
+        try:
+            number = float(value)
+        except ValueError:
+            pass
+        else:
+            if math.isfinite(number):
+                return number
         match = NUMBER_RE.search(value)
         if not match:
             return None
@@ -295,7 +364,7 @@ class ChromiumRenderer:
         if self._playwright:
             self._playwright.stop()
 
-    def render(self, svg_markup: str) -> bytes:
+    def load(self, svg_markup: str) -> None:
         if not self._page:
             raise RuntimeError("Chromium renderer is not initialized.")
 
@@ -307,23 +376,193 @@ class ChromiumRenderer:
         )
         self._page.set_content(html, wait_until="load")
         self._page.wait_for_function("document.fonts.status === 'loaded'")
+        self._page.evaluate(COLLECT_ARROWS_JS)
+
+    def render(self, offsets: List[str]) -> bytes:
+        if not self._page:
+            raise RuntimeError("Chromium renderer is not initialized.")
+
+        self._page.evaluate(SET_OFFSETS_JS, offsets)
         return self._page.screenshot(type="png")
 
 
+_worker_template: Optional[FrameTemplate] = None
+
+
+def rasterize_svg(svg_bytes: Union[bytes, bytearray]) -> bytes:
+    return cairosvg.svg2png(bytestring=svg_bytes)
+
+
+def _init_frame_worker(template: FrameTemplate) -> None:
+    global _worker_template
+    _worker_template = template
+
+
+def _rasterize_frame(offsets: List[str]) -> bytes:
+    if _worker_template is None:
+        raise RuntimeError("Frame worker is not initialized.")
+    return rasterize_svg(fill_frame_template(_worker_template, offsets))
+
+
+def decode_frame(png_bytes: bytes) -> Image.Image:
+    with Image.open(io.BytesIO(png_bytes)) as image:
+        if image.mode != "RGBA":
+            return image.convert("RGBA")
+        image.load()
+        return image
+
+
+def build_gif_palette(frame: Image.Image) -> Image.Image:
+    return frame.convert("RGB").convert(
+        "P", palette=Image.Palette.ADAPTIVE, colors=TRANSPARENT_INDEX
+    )
+
+
+def quantize_frame(frame: Image.Image, palette: Image.Image) -> Image.Image:
+    quantized = frame.convert("RGB").quantize(
+        palette=palette, dither=Image.Dither.FLOYDSTEINBERG
+    )
+    transparent = frame.getchannel("A").point(lambda alpha: 255 if alpha == 0 else 0)
+    quantized.paste(TRANSPARENT_INDEX, mask=transparent)
+    colors = palette.getpalette() or []
+    quantized.putpalette(colors + [0] * (768 - len(colors)))
+    quantized.info["transparency"] = TRANSPARENT_INDEX
+    return quantized
+
+
+def write_gif(png_frames: List[bytes], output_path: str, duration_ms: int) -> None:
+    if not png_frames:
+        raise RuntimeError("No frames rendered.")
+
+    palette: Optional[Image.Image] = None
+    quantized: Dict[bytes, Image.Image] = {}
+    images: List[Image.Image] = []
+    for png_bytes in png_frames:
+        if png_bytes not in quantized:
+            frame = decode_frame(png_bytes)
+            if palette is None:
+                palette = build_gif_palette(frame)
+            quantized[png_bytes] = quantize_frame(frame, palette)
+        images.append(quantized[png_bytes])
+
+    images[0].save(
+        output_path,
+        save_all=True,
+        append_images=images[1:],
+        duration=duration_ms,
+        loop=0,
+        disposal=2,
+    )
+
+
+def write_gif_ffmpeg(
+    png_frames: List[bytes], output_path: str, duration_ms: int
+) -> None:
+    if not png_frames:
+        raise RuntimeError("No frames rendered.")
+    if duration_ms <= 0:
+        raise RuntimeError("The ffmpeg encoder needs a frame duration above 0 ms.")
+
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        raise RuntimeError(
+            "ffmpeg is required for the ffmpeg encoder. "
+            "Install it and make sure it is on PATH."
+        )
+
+    command = [
+        ffmpeg,
+        "-v",
+        "error",
+        "-y",
+        "-f",
+        "image2pipe",
+        "-c:v",
+        "png",
+        "-framerate",
+        f"1000/{duration_ms}",
+        "-i",
+        "-",
+        "-filter_complex",
+        "[0:v]split[a][b];[a]palettegen[p];[b][p]paletteuse=dither=sierra2_4a",
+        "-loop",
+        "0",
+        output_path,
+    ]
+    with subprocess.Popen(
+        command, stdin=subprocess.PIPE, stderr=subprocess.PIPE
+    ) as process:
+        _, stderr = process.communicate(input=b"".join(png_frames))
+
+    if process.returncode != 0:
+        message = stderr.decode("utf-8", errors="replace").strip()
+        raise RuntimeError(f"ffmpeg failed to encode the GIF: {message}")
+
+
 def apply_dash_style(
-    element: ET.Element,
+    element: ET._Element,
     dash_length: float,
     gap_length: float,
-    dash_offset: float,
+    dash_offset: Union[float, str],
 ) -> None:
     style = parse_style(element.get("style", ""))
-    style["stroke-dasharray"] = f"{dash_length} {gap_length}"
-    style["stroke-dashoffset"] = f"{dash_offset}"
-    element.set("style", serialize_style(style))
+    inline_dash = [style.pop(key, None) for key in DASH_PROPERTIES]
+    if any(value is not None for value in inline_dash):
+        if style:
+            element.set("style", serialize_style(style))
+        else:
+            del element.attrib["style"]
+    element.set("stroke-dasharray", f"{dash_length} {gap_length}")
+    element.set("stroke-dashoffset", f"{dash_offset}")
+
+
+def build_frame_template(
+    root: ET._Element,
+    arrow_lines: List[ArrowLine],
+    dash_length: float,
+    gap_length: float,
+) -> FrameTemplate:
+    for index, arrow in enumerate(arrow_lines):
+        arrow.element.set(ARROW_INDEX_ATTR, str(index))
+        apply_dash_style(
+            arrow.element,
+            dash_length,
+            gap_length,
+            OFFSET_PLACEHOLDER.format(index),
+        )
+    markup = ET.tostring(root, encoding="utf-8")
+    slots = [
+        (match.start(), int(match.group(1)))
+        for match in OFFSET_PLACEHOLDER_RE.finditer(markup)
+    ]
+    return bytearray(markup), slots
+
+
+def frame_offset(frame_index: int, step: float, period: float) -> float:
+    offset = frame_index * step
+    if period > 0:
+        offset = round(offset % period, 6) % period
+    return offset
+
+
+def frame_offsets(arrow_lines: List[ArrowLine], offset: float) -> List[str]:
+    offsets = [
+        f"{arrow.direction_sign * offset:+0{OFFSET_WIDTH}.3f}" for arrow in arrow_lines
+    ]
+    if any(len(value) > OFFSET_WIDTH for value in offsets):
+        raise RuntimeError(f"Dash offset {offset} is too large.")
+    return offsets
+
+
+def fill_frame_template(template: FrameTemplate, offsets: List[str]) -> bytearray:
+    buffer, slots = template
+    for start, index in slots:
+        buffer[start : start + OFFSET_WIDTH] = offsets[index].encode("ascii")
+    return buffer
 
 
 def render_frames(
-    root: ET.Element,
+    root: ET._Element,
     arrow_lines: Iterable[ArrowLine],
     frames: int,
     dash_length: float,
@@ -332,53 +571,49 @@ def render_frames(
     duration_ms: int,
     output_path: str,
     renderer: str,
+    encoder: str = "pillow",
 ) -> None:
-    images: List[Image.Image] = []
     arrow_lines = list(arrow_lines)
+    template = build_frame_template(root, arrow_lines, dash_length, gap_length)
+    period = dash_length + gap_length
+    offsets = [frame_offset(frame_index, step, period) for frame_index in range(frames)]
+    unique_offsets = list(dict.fromkeys(offsets))
+    rendered: List[bytes] = []
     if renderer == "chromium":
         width, height = parse_svg_dimensions(root)
         with ChromiumRenderer(width, height) as chromium_renderer:
-            for frame_index in range(frames):
-                offset = frame_index * step
-                for arrow in arrow_lines:
-                    apply_dash_style(
-                        arrow.element,
-                        dash_length,
-                        gap_length,
-                        arrow.direction_sign * offset,
-                    )
-
-                svg_markup = ET.tostring(root, encoding="unicode")
-                png_bytes = chromium_renderer.render(svg_markup)
-                image = Image.open(io.BytesIO(png_bytes)).convert("RGBA")
-                images.append(image)
+            markup = fill_frame_template(template, frame_offsets(arrow_lines, 0.0))
+            chromium_renderer.load(markup.decode("utf-8"))
+            for offset in unique_offsets:
+                rendered.append(
+                    chromium_renderer.render(frame_offsets(arrow_lines, offset))
+                )
     else:
-        for frame_index in range(frames):
-            offset = frame_index * step
-            for arrow in arrow_lines:
-                apply_dash_style(
-                    arrow.element,
-                    dash_length,
-                    gap_length,
-                    arrow.direction_sign * offset,
+        frame_offset_lists = [
+            frame_offsets(arrow_lines, offset) for offset in unique_offsets
+        ]
+        if len(frame_offset_lists) <= 1:
+            for frame_offset_list in frame_offset_lists:
+                rendered.append(
+                    rasterize_svg(fill_frame_template(template, frame_offset_list))
                 )
-
-            svg_bytes = ET.tostring(root, encoding="utf-8", xml_declaration=True)
-            png_bytes = cairosvg.svg2png(bytestring=svg_bytes)
-            image = Image.open(io.BytesIO(png_bytes)).convert("RGBA")
-            images.append(image)
-
-    if not images:
-        raise RuntimeError("No frames rendered.")
-
-    images[0].save(
-        output_path,
-        save_all=True,
-        append_images=images[1:],
-        duration=duration_ms,
-        loop=0,
-        disposal=2,
-    )
+        else:
+            max_workers = min(len(frame_offset_lists), os.cpu_count() or 1)
+            if sys.platform == "win32":
+                max_workers = min(max_workers, MAX_WINDOWS_WORKERS)
+            with ProcessPoolExecutor(
+                max_workers=max_workers,
+                initializer=_init_frame_worker,
+                initargs=(template,),
+            ) as executor:
+                rendered.extend(executor.map(_rasterize_frame, frame_offset_lists))
+
+    png_by_offset = dict(zip(unique_offsets, rendered))
+    png_frames = [png_by_offset[offset] for offset in offsets]
+    if encoder == "ffmpeg":
+        write_gif_ffmpeg(png_frames, output_path, duration_ms)
+    else:
+        write_gif(png_frames, output_path, duration_ms)
 
 
 def build_parser() -> argparse.ArgumentParser:
@@ -409,6 +644,12 @@ def build_parser() -> argparse.ArgumentParser:
         default="chromium",
         help="Renderer to use for SVG frames.",
     )
+    parser.add_argument(
+        "--encoder",
+        choices=("pillow", "ffmpeg"),
+        default="pillow",
+        help="Encoder to use for the output GIF.",
+    )
     return parser
 
 
@@ -440,6 +681,7 @@ def main() -> None:
             duration_ms=args.duration,
             output_path=args.output_gif,
             renderer=args.renderer,
+            encoder=args.encoder,
         )
     except RuntimeError as exc:
         print(str(exc), file=sys.stderr)